@@ -1,204 +1,289 @@
-import graphviz
-
-def create_deployment_flow():
-    dot = graphviz.Digraph('deployment_flow', comment='Contract Deployment Flow')
-    dot.attr(rankdir='TB', splines='ortho')
-
-    # Add styling
-    dot.attr('node', shape='box', style='rounded,filled', 
-            fontname='Arial', fontsize='12', 
-            margin='0.2', width='2')
-    dot.attr('edge', fontname='Arial', fontsize='10', 
-            color='#666666', penwidth='1.5')
-
-    # Define node colors
-    colors = {
-        'core': '#4CAF50',      # Green for core contracts
-        'factory': '#2196F3',   # Blue for factory contracts
-        'deploy': '#FFA726',    # Orange for deployment
-        'generated': '#7B1FA2'  # Purple for generated contracts
-    }
-
-    # Add nodes with colors
-    dot.node('deployment', 'Deployment\nManager', fillcolor=colors['deploy'], fontcolor='white')
-    dot.node('xao_token', 'XAO Token\nERC20', fillcolor=colors['core'], fontcolor='white')
-    dot.node('governance', 'Governance\nDAO Control', fillcolor=colors['core'], fontcolor='white')
-    dot.node('treasury', 'Treasury\nFund Management', fillcolor=colors['core'], fontcolor='white')
-    dot.node('factory', 'Factory Layer\nContract Generation', fillcolor=colors['factory'], fontcolor='white')
-    dot.node('event_factory', 'Event Factory\nEvent Creation', fillcolor=colors['generated'], fontcolor='white')
-    dot.node('artist_factory', 'Artist Factory\nArtist Management', fillcolor=colors['generated'], fontcolor='white')
-
-    # Add edges with labels
-    dot.edge('deployment', 'xao_token', 'Deploy & Initialize')
-    dot.edge('deployment', 'governance', 'Set Permissions')
-    dot.edge('deployment', 'factory', 'Configure')
-    dot.edge('deployment', 'treasury', 'Set Parameters')
-    dot.edge('factory', 'event_factory', 'Generate')
-    dot.edge('factory', 'artist_factory', 'Generate')
-
-    # Save the diagram
-    dot.render('attached_assets/deployment_flow', format='svg', cleanup=True)
-
-def create_event_creation_flow():
-    dot = graphviz.Digraph('event_creation', comment='Event Creation Flow')
-    dot.attr(rankdir='LR', splines='curved')
-
-    # Add styling
-    dot.attr('node', shape='box', style='rounded,filled',
-            fontname='Arial', fontsize='12',
-            margin='0.2', width='2')
-    dot.attr('edge', fontname='Arial', fontsize='10',
-            color='#666666', penwidth='1.5')
-
-    # Define node colors
-    colors = {
-        'user': '#FF5722',      # Deep Orange
-        'factory': '#2196F3',   # Blue
-        'contract': '#4CAF50',  # Green
-        'explorer': '#9C27B0',  # Purple
-    }
-
-    # Add nodes with colors and descriptions
-    dot.node('owner', 'Event Owner\nInitiates Creation', fillcolor=colors['user'], fontcolor='white')
-    dot.node('event_factory', 'Event Factory\nGenerates Contracts', fillcolor=colors['factory'], fontcolor='white')
-    dot.node('parent_event', 'Parent Event\nMain Contract', fillcolor=colors['contract'], fontcolor='white')
-    dot.node('event_explorer', 'Event Explorer\nTracking System', fillcolor=colors['explorer'], fontcolor='white')
-    dot.node('artist_factory', 'Artist Factory\nArtist Management', fillcolor=colors['factory'], fontcolor='white')
-    dot.node('artist_contract', 'Artist Contract\nPerformance Control', fillcolor=colors['contract'], fontcolor='white')
-
-    # Add edges with descriptive labels
-    dot.edge('owner', 'event_factory', 'Create Event Request')
-    dot.edge('event_factory', 'parent_event', 'Deploy Contract')
-    dot.edge('parent_event', 'event_explorer', 'Register Event')
-    dot.edge('event_explorer', 'artist_factory', 'Request Artists')
-    dot.edge('artist_factory', 'artist_contract', 'Generate Contracts')
-
-    # Save the diagram
-    dot.render('attached_assets/event_creation_flow', format='svg', cleanup=True)
-
-def create_ticket_sales_flow():
-    dot = graphviz.Digraph('ticket_sales', comment='Ticket Sales Flow')
-    dot.attr(rankdir='LR', splines='curved')
-
-    # Add styling
-    dot.attr('node', shape='box', style='rounded,filled',
-            fontname='Arial', fontsize='12',
-            margin='0.2', width='2')
-    dot.attr('edge', fontname='Arial', fontsize='10',
-            color='#666666', penwidth='1.5')
-
-    # Define node colors
-    colors = {
-        'user': '#FF5722',      # Deep Orange
-        'contract': '#4CAF50',  # Green
-        'token': '#FFC107',     # Amber
-        'system': '#9C27B0',    # Purple
-    }
-
-    # Add nodes with detailed descriptions
-    dot.node('buyer', 'Ticket Buyer\nPurchase Request', fillcolor=colors['user'], fontcolor='white')
-    dot.node('parent_event', 'Parent Event\nContract\nValidation & Minting', fillcolor=colors['contract'], fontcolor='white')
-    dot.node('nft', 'NFT Ticket\nERC1155/721\nOwnership Proof', fillcolor=colors['token'], fontcolor='black')
-    dot.node('explorer', 'Event Explorer\nSales Tracking', fillcolor=colors['system'], fontcolor='white')
-    dot.node('token', 'XAO Token\nPayment System', fillcolor=colors['token'], fontcolor='black')
-
-    # Add edges with process descriptions
-    dot.edge('buyer', 'parent_event', 'Purchase Request')
-    dot.edge('parent_event', 'nft', 'Mint Ticket')
-    dot.edge('parent_event', 'explorer', 'Update Status')
-    dot.edge('nft', 'token', 'Process Payment')
-
-    # Save the diagram
-    dot.render('attached_assets/ticket_sales_flow', format='svg', cleanup=True)
-
-def create_revenue_flow():
-    dot = graphviz.Digraph('revenue_distribution', comment='Revenue Distribution Flow')
-    dot.attr(rankdir='LR', splines='curved')
-
-    # Add styling
-    dot.attr('node', shape='box', style='rounded,filled',
-            fontname='Arial', fontsize='12',
-            margin='0.2', width='2')
-    dot.attr('edge', fontname='Arial', fontsize='10',
-            color='#666666', penwidth='1.5')
-
-    # Define node colors
-    colors = {
-        'sale': '#FF5722',      # Deep Orange
-        'contract': '#4CAF50',  # Green
-        'treasury': '#FFC107',  # Amber
-        'system': '#2196F3',    # Blue
-        'escrow': '#9C27B0',    # Purple
-    }
-
-    # Add nodes with detailed descriptions
-    dot.node('ticket_sale', 'Ticket Sale\nRevenue Source', fillcolor=colors['sale'], fontcolor='white')
-    dot.node('parent_event', 'Parent Event\nContract\nRevenue Collection', fillcolor=colors['contract'], fontcolor='white')
-    dot.node('treasury', 'XAO Treasury\nFund Management', fillcolor=colors['treasury'], fontcolor='black')
-    dot.node('splitter', 'Revenue Splitter\nDistribution Logic', fillcolor=colors['system'], fontcolor='white')
-    dot.node('escrow', 'Artist Escrow\nSecure Payments', fillcolor=colors['escrow'], fontcolor='white')
-
-    # Add edges with process descriptions
-    dot.edge('ticket_sale', 'parent_event', 'Sale Revenue')
-    dot.edge('parent_event', 'treasury', 'Collect Funds')
-    dot.edge('treasury', 'splitter', 'Calculate Shares')
-    dot.edge('splitter', 'escrow', 'Distribute Revenue')
-
-    # Save the diagram
-    dot.render('attached_assets/revenue_flow', format='svg', cleanup=True)
-
-def create_arbitration_flow():
-    dot = graphviz.Digraph('arbitration', comment='Arbitration Flow')
-    dot.attr(rankdir='LR', splines='curved')
-
-    # Add styling
-    dot.attr('node', shape='box', style='rounded,filled',
-            fontname='Arial', fontsize='12',
-            margin='0.2', width='2')
-    dot.attr('edge', fontname='Arial', fontsize='10',
-            color='#666666', penwidth='1.5')
-
-    # Define node colors
-    colors = {
-        'user': '#FF5722',      # Deep Orange for users
-        'process': '#2196F3',   # Blue for processes
-        'system': '#4CAF50',    # Green for system actions
-        'storage': '#FFC107',   # Amber for storage
-        'decision': '#9C27B0',  # Purple for decisions
-        'refund': '#E91E63',    # Pink for refund process
-        'payment': '#795548'    # Brown for payment
-    }
-
-    # Add nodes with time windows and descriptions
-    dot.node('parties', 'Artist/Venue\nDispute Initiators', fillcolor=colors['user'], fontcolor='white')
-    dot.node('dispute', 'Dispute Filing\nContract Details', fillcolor=colors['process'], fontcolor='white')
-    dot.node('evidence', 'Evidence Collection\n5-Day Window', fillcolor=colors['process'], fontcolor='white')
-    dot.node('ipfs', 'IPFS Storage\nSecure Evidence', fillcolor=colors['storage'], fontcolor='black')
-    dot.node('ai_review', 'AI Review\nContract Analysis', fillcolor=colors['system'], fontcolor='white')
-    dot.node('decision', 'Resolution Options\n- Full Payment\n- Partial Payment\n- Refund\n- Penalties', fillcolor=colors['decision'], fontcolor='white')
-    dot.node('appeal', 'Appeal Window\n2-Day Period', fillcolor=colors['decision'], fontcolor='white')
-    dot.node('ticket_refund', 'Ticket Refunds\nBatch Processing', fillcolor=colors['refund'], fontcolor='white')
-    dot.node('execution', 'Payment Execution\nFund Distribution', fillcolor=colors['payment'], fontcolor='white')
-
-    # Add edges with process descriptions
-    dot.edge('parties', 'dispute', 'File Claim')
-    dot.edge('dispute', 'evidence', 'Submit Evidence')
-    dot.edge('evidence', 'ipfs', 'Store Securely')
-    dot.edge('ipfs', 'ai_review', 'Analyze Contract Terms')
-    dot.edge('ai_review', 'decision', 'Generate Decision')
-    dot.edge('decision', 'appeal', 'Challenge Decision')
-    dot.edge('decision', 'ticket_refund', 'If Event Disrupted')
-    dot.edge('ticket_refund', 'execution', 'Process Refunds')
-    dot.edge('appeal', 'execution', 'Process Payments')
-    dot.edge('decision', 'execution', 'Accept Decision')
-
-    # Save the diagram
-    dot.render('attached_assets/arbitration_flow', format='svg', cleanup=True)
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import MappingProxyType
+
+OUTPUT_DIR = 'attached_assets'
+CACHE_DIR = os.path.join(OUTPUT_DIR, '.cache')
+# Upper bound on concurrent dot processes, whatever the core count
+MAX_DOT_PROCESSES = 2
+
+# Styling shared by every diagram
+_COMMON_NODE_ATTRS = MappingProxyType(dict(
+    shape='box', style='rounded,filled',
+    fontname='Arial', fontsize='12',
+    margin='0.2', width='2',
+))
+_COMMON_EDGE_ATTRS = MappingProxyType(dict(
+    fontname='Arial', fontsize='10',
+    color='#666666', penwidth='1.5',
+))
+
+# Every diagram as data: nodes are (name, label, color key, font color)
+# tuples and edges are (source, target, label) triples
+DIAGRAMS = {
+    'deployment_flow': {
+        'comment': 'Contract Deployment Flow',
+        'rankdir': 'TB',
+        'splines': 'ortho',
+        'colors': {
+            'core': '#4CAF50',      # Green for core contracts
+            'factory': '#2196F3',   # Blue for factory contracts
+            'deploy': '#FFA726',    # Orange for deployment
+            'generated': '#7B1FA2'  # Purple for generated contracts
+        },
+        'nodes': [
+            ('deployment', 'Deployment\nManager', 'deploy', 'white'),
+            ('xao_token', 'XAO Token\nERC20', 'core', 'white'),
+            ('governance', 'Governance\nDAO Control', 'core', 'white'),
+            ('treasury', 'Treasury\nFund Management', 'core', 'white'),
+            ('factory', 'Factory Layer\nContract Generation', 'factory', 'white'),
+            ('event_factory', 'Event Factory\nEvent Creation', 'generated', 'white'),
+            ('artist_factory', 'Artist Factory\nArtist Management', 'generated', 'white'),
+        ],
+        'edges': [
+            ('deployment', 'xao_token', 'Deploy & Initialize'),
+            ('deployment', 'governance', 'Set Permissions'),
+            ('deployment', 'factory', 'Configure'),
+            ('deployment', 'treasury', 'Set Parameters'),
+            ('factory', 'event_factory', 'Generate'),
+            ('factory', 'artist_factory', 'Generate'),
+        ],
+    },
+    'event_creation_flow': {
+        'graph': 'event_creation',
+        'comment': 'Event Creation Flow',
+        'rankdir': 'LR',
+        'splines': 'curved',
+        'colors': {
+            'user': '#FF5722',      # Deep Orange
+            'factory': '#2196F3',   # Blue
+            'contract': '#4CAF50',  # Green
+            'explorer': '#9C27B0',  # Purple
+        },
+        'nodes': [
+            ('owner', 'Event Owner\nInitiates Creation', 'user', 'white'),
+            ('event_factory', 'Event Factory\nGenerates Contracts', 'factory', 'white'),
+            ('parent_event', 'Parent Event\nMain Contract', 'contract', 'white'),
+            ('event_explorer', 'Event Explorer\nTracking System', 'explorer', 'white'),
+            ('artist_factory', 'Artist Factory\nArtist Management', 'factory', 'white'),
+            ('artist_contract', 'Artist Contract\nPerformance Control', 'contract', 'white'),
+        ],
+        'edges': [
+            ('owner', 'event_factory', 'Create Event Request'),
+            ('event_factory', 'parent_event', 'Deploy Contract'),
+            ('parent_event', 'event_explorer', 'Register Event'),
+            ('event_explorer', 'artist_factory', 'Request Artists'),
+            ('artist_factory', 'artist_contract', 'Generate Contracts'),
+        ],
+    },
+    'ticket_sales_flow': {
+        'graph': 'ticket_sales',
+        'comment': 'Ticket Sales Flow',
+        'rankdir': 'LR',
+        'splines': 'curved',
+        'colors': {
+            'user': '#FF5722',      # Deep Orange
+            'contract': '#4CAF50',  # Green
+            'token': '#FFC107',     # Amber
+            'system': '#9C27B0',    # Purple
+        },
+        'nodes': [
+            ('buyer', 'Ticket Buyer\nPurchase Request', 'user', 'white'),
+            ('parent_event', 'Parent Event\nContract\nValidation & Minting', 'contract', 'white'),
+            ('nft', 'NFT Ticket\nERC1155/721\nOwnership Proof', 'token', 'black'),
+            ('explorer', 'Event Explorer\nSales Tracking', 'system', 'white'),
+            ('token', 'XAO Token\nPayment System', 'token', 'black'),
+        ],
+        'edges': [
+            ('buyer', 'parent_event', 'Purchase Request'),
+            ('parent_event', 'nft', 'Mint Ticket'),
+            ('parent_event', 'explorer', 'Update Status'),
+            ('nft', 'token', 'Process Payment'),
+        ],
+    },
+    'revenue_flow': {
+        'graph': 'revenue_distribution',
+        'comment': 'Revenue Distribution Flow',
+        'rankdir': 'LR',
+        'splines': 'curved',
+        'colors': {
+            'sale': '#FF5722',      # Deep Orange
+            'contract': '#4CAF50',  # Green
+            'treasury': '#FFC107',  # Amber
+            'system': '#2196F3',    # Blue
+            'escrow': '#9C27B0',    # Purple
+        },
+        'nodes': [
+            ('ticket_sale', 'Ticket Sale\nRevenue Source', 'sale', 'white'),
+            ('parent_event', 'Parent Event\nContract\nRevenue Collection', 'contract', 'white'),
+            ('treasury', 'XAO Treasury\nFund Management', 'treasury', 'black'),
+            ('splitter', 'Revenue Splitter\nDistribution Logic', 'system', 'white'),
+            ('escrow', 'Artist Escrow\nSecure Payments', 'escrow', 'white'),
+        ],
+        'edges': [
+            ('ticket_sale', 'parent_event', 'Sale Revenue'),
+            ('parent_event', 'treasury', 'Collect Funds'),
+            ('treasury', 'splitter', 'Calculate Shares'),
+            ('splitter', 'escrow', 'Distribute Revenue'),
+        ],
+    },
+    'arbitration_flow': {
+        'graph': 'arbitration',
+        'comment': 'Arbitration Flow',
+        'rankdir': 'LR',
+        'splines': 'curved',
+        'colors': {
+            'user': '#FF5722',      # Deep Orange for users
+            'process': '#2196F3',   # Blue for processes
+            'system': '#4CAF50',    # Green for system actions
+            'storage': '#FFC107',   # Amber for storage
+            'decision': '#9C27B0',  # Purple for decisions
+            'refund': '#E91E63',    # Pink for refund process
+            'payment': '#795548'    # Brown for payment
+        },
+        'nodes': [
+            ('parties', 'Artist/Venue\nDispute Initiators', 'user', 'white'),
+            ('dispute', 'Dispute Filing\nContract Details', 'process', 'white'),
+            ('evidence', 'Evidence Collection\n5-Day Window', 'process', 'white'),
+            ('ipfs', 'IPFS Storage\nSecure Evidence', 'storage', 'black'),
+            ('ai_review', 'AI Review\nContract Analysis', 'system', 'white'),
+            ('decision', 'Resolution Options\n- Full Payment\n- Partial Payment\n- Refund\n- Penalties', 'decision', 'white'),
+            ('appeal', 'Appeal Window\n2-Day Period', 'decision', 'white'),
+            ('ticket_refund', 'Ticket Refunds\nBatch Processing', 'refund', 'white'),
+            ('execution', 'Payment Execution\nFund Distribution', 'payment', 'white'),
+        ],
+        'edges': [
+            ('parties', 'dispute', 'File Claim'),
+            ('dispute', 'evidence', 'Submit Evidence'),
+            ('evidence', 'ipfs', 'Store Securely'),
+            ('ipfs', 'ai_review', 'Analyze Contract Terms'),
+            ('ai_review', 'decision', 'Generate Decision'),
+            ('decision', 'appeal', 'Challenge Decision'),
+            ('decision', 'ticket_refund', 'If Event Disrupted'),
+            ('ticket_refund', 'execution', 'Process Refunds'),
+            ('appeal', 'execution', 'Process Payments'),
+            ('decision', 'execution', 'Accept Decision'),
+        ],
+    },
+}
+
+_ID_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?)')
+_KEYWORDS = frozenset({'node', 'edge', 'graph', 'digraph', 'subgraph', 'strict'})
+
+def _quote(value):
+    # Same quoting rules as the graphviz package: bare IDs stay unquoted
+    if _ID_RE.fullmatch(value) and value.lower() not in _KEYWORDS:
+        return value
+    return '"' + value.replace('"', '\\"') + '"'
+
+def _attrs(attrs):
+    return ' '.join(f'{key}={_quote(value)}' for key, value in attrs)
+
+def render_dot(name, rankdir, splines, nodes, edges, comment=None):
+    """Return the DOT source for a digraph.
+
+    ``nodes`` are (name, label, fillcolor, fontcolor) tuples and ``edges``
+    are (source, target, label) triples. The output matches what
+    ``graphviz.Digraph.source`` produced for the same graph.
+    """
+    lines = [f'// {comment}'] if comment else []
+    lines.append(f'digraph {_quote(name)} {{')
+    lines.append(f'\t{_attrs([("rankdir", rankdir), ("splines", splines)])}')
+    lines.append(f'\tnode [{_attrs(sorted(_COMMON_NODE_ATTRS.items()))}]')
+    lines.append(f'\tedge [{_attrs(sorted(_COMMON_EDGE_ATTRS.items()))}]')
+    lines.extend(
+        f'\t{_quote(node)} [{_attrs([("label", label), ("fillcolor", fill), ("fontcolor", font)])}]'
+        for node, label, fill, font in nodes
+    )
+    lines.extend(
+        f'\t{_quote(src)} -> {_quote(dst)} [{_attrs([("label", label)])}]'
+        for src, dst, label in edges
+    )
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+def build(name, spec):
+    """Return the DOT source for the DIAGRAMS entry ``name``.
+
+    The graph is named after the entry unless the spec sets ``graph``.
+    """
+    colors = spec['colors']
+    return render_dot(
+        spec.get('graph', name),
+        spec['rankdir'],
+        spec['splines'],
+        [(node, label, colors[color], fontcolor)
+         for node, label, color, fontcolor in spec['nodes']],
+        spec['edges'],
+        comment=spec['comment'],
+    )
+
+def _run_dot(paths):
+    subprocess.run(['dot', '-Tsvg', '-O', *paths], check=True)
+
+def _graphviz_version():
+    # dot -V prints e.g. "dot - graphviz version 10.0.1 (0)" to stderr
+    result = subprocess.run(['dot', '-V'], capture_output=True, text=True, check=True)
+    return result.stderr.strip()
+
+def _cache_key(source, graphviz_version):
+    # The dot version is part of the key so upgrading Graphviz re-renders
+    payload = f'{graphviz_version}\n{source}'.encode()
+    return hashlib.sha256(payload).hexdigest()
+
+def render_all(diagrams):
+    """Render DOT sources to SVG, overlapping ``dot`` runs across cores.
+
+    ``diagrams`` maps an output filename (without extension) to its DOT
+    source. Rendered SVGs are cached under CACHE_DIR by a hash of the source
+    and the Graphviz version, so unchanged diagrams are copied from the cache
+    instead of being passed to ``dot`` again.
+
+    Each remaining source is written under OUTPUT_DIR, then ``dot -O``
+    writes ``<source>.svg`` next to each input. The sources are split into
+    at most MAX_DOT_PROCESSES batches, fewer on machines with fewer cores.
+    This trades a little parallelism for keeping process start-up low: each
+    ``dot`` run still renders several diagrams, and on a single core it is
+    still one ``dot`` invocation.
+    """
+    version = _graphviz_version()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    pending = {}
+    for filename, source in diagrams.items():
+        cached = os.path.join(CACHE_DIR, _cache_key(source, version) + '.svg')
+        path = Path(OUTPUT_DIR, filename)
+        if os.path.exists(cached):
+            shutil.copyfile(cached, f'{path}.svg')
+        else:
+            path.write_text(source, encoding='utf-8')
+            pending[str(path)] = cached
+    if not pending:
+        return
+
+    paths = list(pending)
+    workers = max(1, min(len(paths), os.cpu_count() or 1, MAX_DOT_PROCESSES))
+    batches = [paths[i::workers] for i in range(workers)]
+    try:
+        # Threads are enough here: each one just waits on a dot subprocess
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_run_dot, batches))
+    finally:
+        # Only the SVGs are kept
+        for path in paths:
+            os.remove(path)
+
+    for path, cached in pending.items():
+        shutil.copyfile(path + '.svg', cached)
+
+def main():
+    # Build all diagrams first, then hand them to dot together
+    render_all({name: build(name, spec) for name, spec in DIAGRAMS.items()})
 
 if __name__ == '__main__':
-    # Generate all diagrams
-    create_deployment_flow()
-    create_event_creation_flow()
-    create_ticket_sales_flow()
-    create_revenue_flow()
-    create_arbitration_flow()
\ No newline at end of file
+    main()
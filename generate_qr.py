@@ -1,19 +1,46 @@
+import hashlib
+import os
+import sys
+
 import qrcode
 
+URL = 'https://xao.fun'
+OUTPUT = 'attached_assets/xao_qr.png'
+KEY_FILE = OUTPUT + '.sha'
+
+# 'https://xao.fun' is 15 bytes, which overflows version 2 at ECC level H
+# (14 bytes) and fits version 3 (24 bytes), so the version is fixed instead
+# of searched for with fit=True.
+VERSION = 3
+ERROR_CORRECTION = 'H'
+BOX_SIZE = 10
+BORDER = 4
+
+# Skip regeneration when the PNG was already made from these exact inputs
+key = hashlib.sha256(
+    f'{URL}|v={VERSION}|ec={ERROR_CORRECTION}|box={BOX_SIZE}|bd={BORDER}'.encode()
+).hexdigest()
+if os.path.exists(OUTPUT) and os.path.exists(KEY_FILE):
+    with open(KEY_FILE) as f:
+        if f.read().strip() == key:
+            sys.exit(0)
+
 # Create QR code instance
 qr = qrcode.QRCode(
-    version=1,
-    error_correction=qrcode.constants.ERROR_CORRECT_H,
-    box_size=10,
-    border=4,
+    version=VERSION,
+    error_correction=getattr(qrcode.constants, f'ERROR_CORRECT_{ERROR_CORRECTION}'),
+    box_size=BOX_SIZE,
+    border=BORDER,
 )
 
 # Add data
-qr.add_data('https://xao.fun')
-qr.make(fit=True)
+qr.add_data(URL)
+qr.make(fit=False)
 
 # Create an image from the QR Code
 qr_image = qr.make_image(fill_color="black", back_color="white")
 
-# Save it
-qr_image.save('attached_assets/xao_qr.png')
+# Save it, then record the inputs it was made from
+qr_image.save(OUTPUT)
+with open(KEY_FILE, 'w') as f:
+    f.write(key + '\n')
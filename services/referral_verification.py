@@ -1,65 +1,499 @@
 import os
+import re
+import copy
 import json
 import time
-from openai import OpenAI
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+import httpx
+from openai import AsyncOpenAI, OpenAI
 
-# the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-# do not change this unless explicitly requested by the user
-openai = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON helpers backed by orjson when it is installed and by the standard
+# library otherwise. Output is always compact: whitespace costs input tokens.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch
+# the latter either way.
+def _json_dumps(value, sort_keys=False):
+    return json.dumps(value, sort_keys=sort_keys, separators=(",", ":"))
+
+if orjson is not None:
+    def _dumps(value, sort_keys=False):
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(value, option=option).decode()
+        except orjson.JSONEncodeError:
+            # orjson rejects ints beyond 64 bits, e.g. wei amounts
+            return _json_dumps(value, sort_keys=sort_keys)
+
+    _loads = orjson.loads
+else:
+    _dumps = _json_dumps
+    _loads = json.loads
+
+# One sync client per process so TLS connections and HTTP/2 streams are
+# reused across verifications. Import this module once at startup rather than
+# constructing clients inside request handlers.
+HTTP_TIMEOUT = 30.0
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+
+openai = OpenAI(
+    api_key=os.environ.get("OPENAI_API_KEY"),
+    http_client=httpx.Client(http2=True, timeout=HTTP_TIMEOUT, limits=_HTTP_LIMITS),
+)
+
+def _async_client():
+    """
+    Build an AsyncOpenAI client with its own pooled HTTP/2 connections.
+
+    Async connections belong to the event loop that opened them, so a
+    module-level client breaks once that loop closes (e.g. a second
+    asyncio.run). verify_referrals_batch opens one client per batch instead.
+    """
+    return AsyncOpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        http_client=httpx.AsyncClient(http2=True, timeout=HTTP_TIMEOUT, limits=_HTTP_LIMITS),
+    )
+
+# Referrals are triaged by the cheaper model first and only re-checked by
+# gpt-4o when the triage confidence falls inside ESCALATION_BAND
+TRIAGE_MODEL = "gpt-4o-mini"
+ESCALATION_MODEL = "gpt-4o"
+ESCALATION_BAND = (0.4, 0.7)
+MAX_RESPONSE_TOKENS = 256
+
+# Thresholds for referrals that are decided without calling OpenAI; see
+# _prefilter. Anything in between is sent to the models.
+PREFILTER_MIN_ACTIVITY = 50
+PREFILTER_MIN_SUSTAINED_DAYS = 14
+PREFILTER_BURST_SECONDS = 1
+PREFILTER_BURST_MIN_ACTIONS = 10
+PREFILTER_BURST_MAX_INTERACTIONS = 1
+
+# Replies are streamed. Once "verified" and "confidence" have arrived, the
+# stream is closed right away if the triage result will be escalated anyway,
+# and otherwise after this many further chunks of reasoning.
+STREAM_REASONING_CHUNKS = 64
+
+# Upper bound on in-flight requests for verify_referrals_batch
+BATCH_CONCURRENCY = 16
+
+# Results are memoized per user_data, in memory and on disk, for CACHE_TTL
+# seconds. Set XAO_REFERRAL_CACHE_DIR to an empty string to disable the disk
+# cache.
+CACHE_TTL = 24 * 60 * 60
+CACHE_SIZE = 4096
+CACHE_DIR = os.environ.get(
+    "XAO_REFERRAL_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "xao", "referral"),
+)
+_memory_cache = OrderedDict()
+# The module is shared by concurrent request handlers and by the threads the
+# batch path uses for cache I/O
+_memory_cache_lock = threading.Lock()
+
+def _cache_key(user_data):
+    canonical = _dumps(user_data, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _read_disk_cache(key):
+    if not CACHE_DIR:
+        return None
+    try:
+        with open(os.path.join(CACHE_DIR, f"{key}.json")) as f:
+            entry = _loads(f.read())
+    except (OSError, ValueError):
+        return None
+    # Anything but a well-formed entry is treated as a miss
+    if (not isinstance(entry, dict) or "result" not in entry
+            or _number(entry, "cached_at") is None):
+        return None
+    return entry
+
+def _write_disk_cache(key, entry):
+    if not CACHE_DIR:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(_dumps(entry))
+        os.replace(tmp_path, path)
+    except OSError:
+        # The cache is best-effort; a read-only home must not fail verification
+        pass
+
+def _remember(key, entry):
+    with _memory_cache_lock:
+        _memory_cache[key] = entry
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+def _cache_get(key):
+    """Return a copy of the cached result for ``key``, or None if missing or expired."""
+    with _memory_cache_lock:
+        entry = _memory_cache.get(key)
+    if entry is None:
+        entry = _read_disk_cache(key)
+        if entry is None:
+            return None
+    if time.time() - entry.get("cached_at", 0) > CACHE_TTL:
+        with _memory_cache_lock:
+            _memory_cache.pop(key, None)
+        return None
+    _remember(key, entry)
+    return copy.deepcopy(entry["result"])
+
+def _cache_put(key, result):
+    entry = {"cached_at": time.time(), "result": copy.deepcopy(result)}
+    _remember(key, entry)
+    _write_disk_cache(key, entry)
+
+_SYSTEM_MESSAGE = (
+    "You are a referral verification expert. Analyze the given data and "
+    "detect fraudulent or spam referrals."
+)
+_PROMPT_TEMPLATE = (
+    "Analyze this referral for fraud or spam.\n"
+    "User Activity: {activity}\n"
+    "Time Patterns: {timing}\n"
+    "Interaction Data: {interactions}\n"
+    "Judge: real engagement in activity; natural timing of actions; "
+    "referrer/referred interaction patterns.\n"
+    'Reply with JSON: {{"verified": bool, "confidence": 0-1, '
+    '"reasoning": "brief explanation"}}'
+)
+
+def _build_request(user_data, model):
+    """Build the chat completion arguments for one referral."""
+    prompt = _PROMPT_TEMPLATE.format(
+        activity=_dumps(user_data.get('activity', {})),
+        timing=_dumps(user_data.get('timing', {})),
+        interactions=_dumps(user_data.get('interactions', {})),
+    )
+
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": _SYSTEM_MESSAGE
+            },
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        # The reply is three short fields; a cap keeps decoding time bounded
+        "max_tokens": MAX_RESPONSE_TOKENS,
+        "stream": True,
+    }
+
+def _with_metadata(result, model, reasoning_truncated=False):
+    # Add metadata about the verification process
+    result["timestamp"] = time.time_ns() // 1_000_000_000
+    result["model_version"] = model
+    result["reasoning_truncated"] = reasoning_truncated
+
+    return result
+
+def _parse_reply(content, model):
+    """Turn the complete reply text from ``model`` into a verification result."""
+    try:
+        result = _loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{model} returned invalid JSON: {e}") from e
+    return _with_metadata(result, model)
+
+_JSON_SEPARATORS = re.compile(r"[\s,]*")
+_JSON_WHITESPACE = re.compile(r"\s*")
+_JSON_NUMBER_END = re.compile(r"[\s,}]")
+
+class _StreamedReply:
+    """
+    Collects a streamed JSON reply and decodes its top-level members as soon
+    as each one is complete, so reading can stop before the model finishes.
+    """
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, model):
+        self.model = model
+        self.text = ""
+        self.members = {}
+        self.stopped_early = False
+        # Borderline triage answers are re-checked by gpt-4o, so there is no
+        # point in reading their reasoning
+        self._stop_if_borderline = model == TRIAGE_MODEL
+        self._reasoning_chunks = 0
+        self._pos = None
+
+    def feed(self, chunk):
+        """Add one stream chunk; return True once the rest can be skipped."""
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            return False
+        self.text += chunk.choices[0].delta.content
+        self._scan()
+
+        if "verified" not in self.members or "confidence" not in self.members:
+            return False
+        if "reasoning" in self.members:
+            # Complete already; let the stream finish and parse it normally
+            return False
+        if self._stop_if_borderline and _needs_escalation(self.members):
+            self.stopped_early = True
+        else:
+            self._reasoning_chunks += 1
+            self.stopped_early = self._reasoning_chunks > STREAM_REASONING_CHUNKS
+        return self.stopped_early
+
+    def result(self):
+        """The verification result; reasoning is truncated if stopped early."""
+        if not self.stopped_early:
+            return _parse_reply(self.text, self.model)
+        result = dict(self.members)
+        result["reasoning"] = self._partial_string("reasoning")
+        return _with_metadata(result, self.model, reasoning_truncated=True)
+
+    def _scan(self):
+        if self._pos is None:
+            start = self.text.find("{")
+            if start < 0:
+                return
+            self._pos = start + 1
+        while True:
+            member = self._decode_member(self._pos)
+            if member is None:
+                return
+            key, value, self._pos = member
+            self.members[key] = value
+
+    def _decode_member(self, pos):
+        text = self.text
+        pos = _JSON_SEPARATORS.match(text, pos).end()
+        try:
+            key, pos = self._decoder.raw_decode(text, pos)
+            pos = _JSON_WHITESPACE.match(text, pos).end()
+            if not isinstance(key, str) or not text.startswith(":", pos):
+                return None
+            pos = _JSON_WHITESPACE.match(text, pos + 1).end()
+            value, end = self._decoder.raw_decode(text, pos)
+        except ValueError:
+            return None
+        # A number is only final once a delimiter follows it: "0." decodes as
+        # 0 but may still grow into 0.55 with the next chunk
+        if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                and not _JSON_NUMBER_END.match(text, end)):
+            return None
+        return key, value, end
+
+    def _partial_string(self, key):
+        # Best-effort prefix of the string member ``key`` still being streamed
+        text = self.text
+        pos = _JSON_SEPARATORS.match(text, self._pos).end()
+        name = json.dumps(key)
+        if not text.startswith(name, pos):
+            return ""
+        pos = _JSON_WHITESPACE.match(text, pos + len(name)).end()
+        if not text.startswith(":", pos):
+            return ""
+        pos = _JSON_WHITESPACE.match(text, pos + 1).end()
+        if not text.startswith('"', pos):
+            return ""
+        raw = text[pos + 1:]
+        # Drop an escape sequence cut off mid-way (at most "\uXXX")
+        for cut in range(min(len(raw), 5) + 1):
+            try:
+                return json.loads('"' + raw[:len(raw) - cut] + '"')
+            except ValueError:
+                continue
+        return ""
+
+def _complete(user_data, model):
+    """Stream one reply from ``model`` and return its verification result."""
+    reply = _StreamedReply(model)
+    with openai.chat.completions.create(**_build_request(user_data, model)) as stream:
+        for chunk in stream:
+            if reply.feed(chunk):
+                break
+    return reply.result()
+
+async def _complete_async(client, user_data, model):
+    """Async counterpart of _complete, using ``client``."""
+    reply = _StreamedReply(model)
+    async with await client.chat.completions.create(**_build_request(user_data, model)) as stream:
+        async for chunk in stream:
+            if reply.feed(chunk):
+                break
+    return reply.result()
+
+def _number(section, field):
+    value = section.get(field) if isinstance(section, dict) else None
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+def _prefilter(user_data):
+    """
+    Decide unambiguous referrals with fixed rules instead of a model call.
+
+    Rejected: no recorded activity and no interactions (both counts 0), or a
+    scripted burst: at least PREFILTER_BURST_MIN_ACTIONS entries in
+    ``timing['timestamps']``, all within PREFILTER_BURST_SECONDS, with no
+    activity outside the burst and at most PREFILTER_BURST_MAX_INTERACTIONS
+    interactions. Accepted: more than PREFILTER_MIN_ACTIVITY
+    actions with interactions sustained over more than
+    PREFILTER_MIN_SUSTAINED_DAYS days.
+
+    Returns:
+        dict or None: A verification result with model_version "rules", or
+        None when the referral needs a model to decide
+    """
+    activity = user_data.get('activity', {})
+    timing = user_data.get('timing', {})
+    interactions = user_data.get('interactions', {})
+    activity_count = _number(activity, 'count')
+    interaction_count = _number(interactions, 'count')
+    sustained_days = _number(interactions, 'sustained_days')
+
+    if activity_count == 0 and interaction_count == 0:
+        return _with_metadata({
+            "verified": False,
+            "confidence": 0.99,
+            "reasoning": "No activity or interactions recorded for the referred user."
+        }, "rules")
+
+    timestamps = timing.get('timestamps') if isinstance(timing, dict) else None
+    if (isinstance(timestamps, list) and len(timestamps) >= PREFILTER_BURST_MIN_ACTIONS
+            and all(isinstance(t, (int, float)) and not isinstance(t, bool) for t in timestamps)
+            and max(timestamps) - min(timestamps) <= PREFILTER_BURST_SECONDS
+            and activity_count is not None and activity_count <= len(timestamps)
+            and interaction_count is not None
+            and interaction_count <= PREFILTER_BURST_MAX_INTERACTIONS):
+        return _with_metadata({
+            "verified": False,
+            "confidence": 0.95,
+            "reasoning": "All recorded actions happened within one second, which indicates automation."
+        }, "rules")
+
+    if (activity_count is not None and activity_count > PREFILTER_MIN_ACTIVITY
+            and sustained_days is not None and sustained_days > PREFILTER_MIN_SUSTAINED_DAYS):
+        return _with_metadata({
+            "verified": True,
+            "confidence": 0.95,
+            "reasoning": "High activity with interactions sustained over more than two weeks."
+        }, "rules")
+
+    return None
+
+def _needs_escalation(result):
+    """Whether a triage result is borderline enough to re-check with gpt-4o."""
+    low, high = ESCALATION_BAND
+    confidence = result.get("confidence")
+    return isinstance(confidence, (int, float)) and low <= confidence <= high
 
 def verify_referral(user_data):
     """
-    Verify a referral using OpenAI's GPT-4 model.
-    
+    Verify a referral using OpenAI models.
+
+    The referral is triaged with gpt-4o-mini; results whose confidence falls
+    inside ESCALATION_BAND are re-checked with gpt-4o. Clear-cut referrals
+    are decided by _prefilter without any model call. Results are cached for
+    CACHE_TTL seconds, so repeating identical user_data returns the earlier
+    verification without calling OpenAI. Replies are streamed and may be cut
+    short once the decision is known, in which case ``reasoning`` holds only
+    the first STREAM_REASONING_CHUNKS chunks of the explanation and
+    ``reasoning_truncated`` is True; such results are cached like any other.
+
     Args:
         user_data (dict): Data about the referral including user activity,
                          interaction patterns, and timing
-    
+
     Returns:
         dict: Verification result including:
             - verified (bool): Whether the referral appears legitimate
             - confidence (float): Confidence score between 0 and 1
             - reasoning (str): Explanation of the verification decision
+            - timestamp (int): Unix time in seconds when the result was made
+            - model_version (str): The model that produced the result, or
+              "rules" when the prefilter decided it
+            - reasoning_truncated (bool): Whether the reply was cut short and
+              ``reasoning`` is incomplete
+
+    Raises:
+        openai.RateLimitError, openai.InternalServerError,
+        openai.APIConnectionError: Transient. The client has already retried
+            these twice with backoff; callers may retry later
+        openai.APIStatusError: Any other error response (bad request,
+            authentication, ...). These are permanent and should not be retried
+        ValueError: The model replied with invalid JSON
     """
-    try:
-        prompt = f"""
-        Analyze this referral for potential fraud or spam:
-        User Activity: {json.dumps(user_data.get('activity', {}), indent=2)}
-        Time Patterns: {json.dumps(user_data.get('timing', {}), indent=2)}
-        Interaction Data: {json.dumps(user_data.get('interactions', {}), indent=2)}
-
-        Determine if this is a legitimate referral by analyzing:
-        1. Activity patterns suggesting real user engagement
-        2. Natural timing distribution of actions
-        3. Interaction patterns between referrer and referred user
-
-        Respond with a JSON object containing:
-        {
-            "verified": boolean,
-            "confidence": float between 0 and 1,
-            "reasoning": "detailed explanation"
-        }
-        """
-
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a referral verification expert. Analyze the given data and detect fraudulent or spam referrals."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-
-        result = json.loads(response.choices[0].message.content)
-        
-        # Add metadata about the verification process
-        result["timestamp"] = str(int(time.time()))
-        result["model_version"] = "gpt-4o"
-        
+    result = _prefilter(user_data)
+    if result is not None:
         return result
 
-    except Exception as e:
-        raise Exception(f"Failed to verify referral: {str(e)}")
+    key = _cache_key(user_data)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    result = _complete(user_data, TRIAGE_MODEL)
+
+    if _needs_escalation(result):
+        result = _complete(user_data, ESCALATION_MODEL)
+
+    _cache_put(key, result)
+    return result
+
+async def _verify_one(client, user_data):
+    """Async counterpart of verify_referral used by verify_referrals_batch.
+
+    Raises the same errors as verify_referral.
+    """
+    result = _prefilter(user_data)
+    if result is not None:
+        return result
+
+    # Cache lookups and writes may touch the disk; keep them off the event loop
+    key = _cache_key(user_data)
+    cached = await asyncio.to_thread(_cache_get, key)
+    if cached is not None:
+        return cached
+
+    result = await _complete_async(client, user_data, TRIAGE_MODEL)
+
+    if _needs_escalation(result):
+        result = await _complete_async(client, user_data, ESCALATION_MODEL)
+
+    await asyncio.to_thread(_cache_put, key, result)
+    return result
+
+async def verify_referrals_batch(users, concurrency=BATCH_CONCURRENCY):
+    """
+    Verify many referrals concurrently.
+
+    The whole batch shares one async client, whose connections are closed
+    when the batch finishes, so batches can run on different event loops.
+
+    Args:
+        users (list[dict]): One user_data dict per referral, in the format
+                            accepted by verify_referral
+        concurrency (int): Maximum number of requests in flight at once
+
+    Returns:
+        list[dict]: Verification results in the same order as ``users``
+
+    Raises:
+        The first error raised by any verification; see verify_referral
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with _async_client() as client:
+        async def bounded(user_data):
+            async with semaphore:
+                return await _verify_one(client, user_data)
+
+        return await asyncio.gather(*(bounded(u) for u in users))
@@ -0,0 +1,288 @@
+import os
+import json
+import asyncio
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# The module builds its sync OpenAI client at import time
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import referral_verification as rv
+
+
+def _chunk(content):
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def _stream(reply, pieces):
+    """Feed ``pieces`` to ``reply`` until it asks to stop; return chunks read."""
+    for count, piece in enumerate(pieces, 1):
+        if reply.feed(_chunk(piece)):
+            return count
+    return len(pieces)
+
+
+def _pieces(text, size=4):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class _FakeAsyncStream:
+    def __init__(self, text):
+        self._chunks = [_chunk(p) for p in _pieces(text)]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+class _FakeAsyncClient:
+    """
+    Stand-in for AsyncOpenAI. Like real pooled connections, it only works on
+    the event loop that first used it.
+    """
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.models = []
+        self.closed = False
+        self._loop = None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+        return False
+
+    async def _create(self, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.closed or self._loop not in (None, loop):
+            raise RuntimeError("Event loop is closed")
+        self._loop = loop
+        self.models.append(kwargs["model"])
+        return _FakeAsyncStream(self.replies[kwargs["model"]])
+
+
+class JsonHelpersTest(unittest.TestCase):
+    def test_ints_beyond_64_bits(self):
+        user_data = {"activity": {"volume_wei": 25 * 10**18}}
+
+        self.assertEqual(rv._dumps(user_data), '{"activity":{"volume_wei":25000000000000000000}}')
+        self.assertEqual(len(rv._cache_key(user_data)), 64)
+        prompt = rv._build_request(user_data, rv.TRIAGE_MODEL)["messages"][1]["content"]
+        self.assertIn("25000000000000000000", prompt)
+
+
+class StreamedReplyTest(unittest.TestCase):
+    def test_number_split_across_chunks_is_not_truncated(self):
+        # Token-sized pieces, with the confidence split as "0" "." "55"
+        pieces = ['{"', 'verified', '":', ' true', ',', ' "', 'confidence',
+                  '":', ' 0', '.', '55', ',', ' "', 'reasoning', '":', ' "']
+        pieces += ['word '] * 100 + ['"}']
+        reply = rv._StreamedReply(rv.TRIAGE_MODEL)
+
+        read = _stream(reply, pieces)
+
+        self.assertEqual(reply.members["confidence"], 0.55)
+        self.assertTrue(reply.stopped_early)
+        self.assertEqual(read, pieces.index('55') + 2)
+        self.assertTrue(rv._needs_escalation(reply.result()))
+
+    def test_complete_reply_in_small_pieces(self):
+        text = json.dumps({"verified": False, "confidence": 0.9, "reasoning": "short"})
+        reply = rv._StreamedReply(rv.ESCALATION_MODEL)
+
+        _stream(reply, [text[i:i + 3] for i in range(0, len(text), 3)])
+
+        self.assertFalse(reply.stopped_early)
+        result = reply.result()
+        self.assertEqual(result["confidence"], 0.9)
+        self.assertEqual(result["reasoning"], "short")
+
+
+class PrefilterTest(unittest.TestCase):
+    def test_scripted_burst_is_rejected(self):
+        user_data = {
+            "activity": {"count": 12},
+            "timing": {"timestamps": [100 + i * 0.05 for i in range(12)]},
+            "interactions": {"count": 0},
+        }
+        result = rv._prefilter(user_data)
+        self.assertIs(result["verified"], False)
+        self.assertEqual(result["model_version"], "rules")
+
+    def test_quick_actions_with_engagement_go_to_the_model(self):
+        user_data = {
+            "activity": {"count": 3},
+            "timing": {"timestamps": [100, 100.5]},
+            "interactions": {"count": 2},
+        }
+        self.assertIsNone(rv._prefilter(user_data))
+
+    def test_bool_timestamps_are_ignored(self):
+        user_data = {
+            "activity": {"count": 1},
+            "timing": {"timestamps": [True, False] * 6},
+            "interactions": {"count": 0},
+        }
+        self.assertIsNone(rv._prefilter(user_data))
+
+
+class VerifyReferralCacheTest(unittest.TestCase):
+    def setUp(self):
+        rv._memory_cache.clear()
+        patcher = mock.patch.object(rv, "CACHE_DIR", "")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(rv._memory_cache.clear)
+
+    def _verify_twice(self, reply_text):
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs["model"])
+            pieces = [reply_text[i:i + 4] for i in range(0, len(reply_text), 4)]
+            stream = mock.MagicMock()
+            stream.__enter__.return_value = [_chunk(p) for p in pieces]
+            return stream
+
+        user_data = {"activity": {"count": 3}, "interactions": {"count": 1}}
+        with mock.patch.object(rv.openai.chat.completions, "create", create):
+            results = [rv.verify_referral(user_data), rv.verify_referral(user_data)]
+        return calls, results
+
+    def test_complete_reply_is_cached(self):
+        reply = json.dumps({"verified": True, "confidence": 0.9, "reasoning": "ok"})
+        calls, results = self._verify_twice(reply)
+        self.assertEqual(calls, [rv.TRIAGE_MODEL])
+        self.assertEqual([r["reasoning_truncated"] for r in results], [False, False])
+
+    def test_reply_cut_short_is_cached_and_marked(self):
+        reply = json.dumps({"verified": True, "confidence": 0.9, "reasoning": "word " * 200})
+        calls, results = self._verify_twice(reply)
+        self.assertEqual(calls, [rv.TRIAGE_MODEL])
+        self.assertEqual([r["reasoning_truncated"] for r in results], [True, True])
+        self.assertEqual(results[0], results[1])
+        self.assertTrue(results[0]["reasoning"].startswith("word word"))
+
+
+class CascadeTest(unittest.TestCase):
+    def setUp(self):
+        rv._memory_cache.clear()
+        patcher = mock.patch.object(rv, "CACHE_DIR", "")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(rv._memory_cache.clear)
+        self.user_data = {"activity": {"count": 3}, "interactions": {"count": 1}}
+        self.replies = {
+            rv.TRIAGE_MODEL: json.dumps({"verified": True, "confidence": 0.5, "reasoning": "unsure"}),
+            rv.ESCALATION_MODEL: json.dumps({"verified": False, "confidence": 0.8, "reasoning": "fake"}),
+        }
+
+    def test_borderline_triage_escalates(self):
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs["model"])
+            stream = mock.MagicMock()
+            stream.__enter__.return_value = [_chunk(p) for p in _pieces(self.replies[kwargs["model"]])]
+            return stream
+
+        with mock.patch.object(rv.openai.chat.completions, "create", create):
+            result = rv.verify_referral(self.user_data)
+
+        self.assertEqual(calls, [rv.TRIAGE_MODEL, rv.ESCALATION_MODEL])
+        self.assertEqual(result["model_version"], "gpt-4o")
+        self.assertIs(result["verified"], False)
+        self.assertEqual(result["confidence"], 0.8)
+
+    def test_borderline_triage_escalates_in_batch(self):
+        client = _FakeAsyncClient(self.replies)
+
+        with mock.patch.object(rv, "_async_client", lambda: client):
+            results = asyncio.run(rv.verify_referrals_batch([self.user_data]))
+
+        self.assertEqual(client.models, [rv.TRIAGE_MODEL, rv.ESCALATION_MODEL])
+        self.assertEqual(results[0]["model_version"], "gpt-4o")
+        self.assertIs(results[0]["verified"], False)
+
+
+class DiskCacheTest(unittest.TestCase):
+    def test_malformed_entries_are_misses(self):
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch.object(rv, "CACHE_DIR", cache_dir):
+            for content in ("[1]", "{}", '{"cached_at": 1}', '{"result": {}}',
+                            '{"cached_at": "x", "result": {}}', "not json"):
+                with open(os.path.join(cache_dir, "key.json"), "w") as f:
+                    f.write(content)
+                rv._memory_cache.clear()
+                self.assertIsNone(rv._cache_get("key"), content)
+
+
+class MemoryCacheTest(unittest.TestCase):
+    def setUp(self):
+        rv._memory_cache.clear()
+        self.addCleanup(rv._memory_cache.clear)
+
+    def test_concurrent_puts_respect_the_size_limit(self):
+        errors = []
+
+        def put_many(offset):
+            try:
+                for i in range(2000):
+                    rv._cache_put(f"{offset}-{i}", {"verified": True})
+                    rv._cache_get(f"{offset}-{i // 2}")
+            except Exception as e:
+                errors.append(e)
+
+        with mock.patch.object(rv, "CACHE_DIR", ""), mock.patch.object(rv, "CACHE_SIZE", 8):
+            threads = [threading.Thread(target=put_many, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(rv._memory_cache), 8)
+
+
+class VerifyReferralsBatchTest(unittest.TestCase):
+    def setUp(self):
+        rv._memory_cache.clear()
+        patcher = mock.patch.object(rv, "CACHE_DIR", "")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(rv._memory_cache.clear)
+
+    def test_batches_on_separate_event_loops(self):
+        reply = json.dumps({"verified": True, "confidence": 0.9, "reasoning": "ok"})
+        clients = []
+
+        def new_client():
+            clients.append(_FakeAsyncClient({rv.TRIAGE_MODEL: reply}))
+            return clients[-1]
+
+        with mock.patch.object(rv, "_async_client", new_client):
+            for count in (1, 2):
+                users = [{"activity": {"count": count}, "interactions": {"count": n}}
+                         for n in range(3)]
+                results = asyncio.run(rv.verify_referrals_batch(users))
+                self.assertEqual([r["verified"] for r in results], [True] * 3)
+
+        self.assertEqual(len(clients), 2)
+        self.assertTrue(all(client.closed for client in clients))
+
+
+if __name__ == "__main__":
+    unittest.main()